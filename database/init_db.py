@@ -3,15 +3,20 @@
 ISMS-P 데이터베이스 초기화 스크립트 (개선판)
 - 외래키 활성화, 인덱스 추가, 상태값 제약, updated_at 자동 갱신 트리거
 - (선택) FTS5 전문검색 테이블/동기화 트리거
+- 초기 적재: 스키마+샘플을 단일 트랜잭션으로, 적재 동안만 저널/동기화 완화 후 WAL 복원
+- 적재 순서: 테이블/트리거 → 샘플 INSERT → 인덱스 → FTS → ANALYZE
 """
 
+import itertools
 import sqlite3
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+from pathlib import Path
 
-DB_PATH = os.getenv('DB_PATH', 'data/isms_p.db')
+DB_PATH = Path(os.getenv('DB_PATH', 'data/isms_p.db'))
 
-SCHEMA = r"""
+# 테이블 + 트리거 (인덱스는 샘플 적재 후 SCHEMA_INDEXES에서 생성)
+SCHEMA_TABLES = r"""
 PRAGMA foreign_keys = ON;
 
 -- 요구사항
@@ -59,13 +64,6 @@ CREATE TABLE IF NOT EXISTS documents (
     data      TEXT
 );
 
--- 인덱스
-CREATE INDEX IF NOT EXISTS idx_req_item_code  ON isms_requirements(item_code);
-CREATE INDEX IF NOT EXISTS idx_req_category   ON isms_requirements(category);
-CREATE INDEX IF NOT EXISTS idx_req_title      ON isms_requirements(title);
-CREATE INDEX IF NOT EXISTS idx_ev_item_code   ON evidences(item_code);
-CREATE UNIQUE INDEX IF NOT EXISTS idx_doc_path ON documents(file_path);
-
 -- updated_at 자동 갱신 트리거 (재귀 방지 조건 포함)
 CREATE TRIGGER IF NOT EXISTS trg_req_updated_at
 AFTER UPDATE ON isms_requirements
@@ -88,17 +86,23 @@ BEGIN
 END;
 """
 
+# 인덱스: 적재 중 행마다 인덱스를 갱신하지 않도록 샘플 INSERT 이후 생성
+SCHEMA_INDEXES = r"""
+CREATE INDEX IF NOT EXISTS idx_req_item_code  ON isms_requirements(item_code);
+CREATE INDEX IF NOT EXISTS idx_req_category   ON isms_requirements(category);
+CREATE INDEX IF NOT EXISTS idx_req_title      ON isms_requirements(title);
+CREATE INDEX IF NOT EXISTS idx_ev_item_code   ON evidences(item_code);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_doc_path ON documents(file_path);
+"""
+
 # (선택) FTS5: 있으면 쓰고, 없으면 조용히 건너뜀
 FTS = r"""
 CREATE VIRTUAL TABLE IF NOT EXISTS isms_requirements_fts
 USING fts5(item_code, title, description, requirement, control_objective,
            content='isms_requirements', content_rowid='id');
 
--- 초기 동기화
-INSERT INTO isms_requirements_fts(rowid, item_code, title, description, requirement, control_objective)
-SELECT id, item_code, title, description, requirement, control_objective
-FROM isms_requirements
-WHERE id NOT IN (SELECT rowid FROM isms_requirements_fts);
+-- 초기 동기화 (외부 콘텐츠 테이블은 rowid 조회가 원본 테이블을 읽으므로 rebuild로 색인 재구성)
+INSERT INTO isms_requirements_fts(isms_requirements_fts) VALUES ('rebuild');
 
 -- 변경 동기화 트리거
 CREATE TRIGGER IF NOT EXISTS trg_req_ai AFTER INSERT ON isms_requirements BEGIN
@@ -119,6 +123,26 @@ CREATE TRIGGER IF NOT EXISTS trg_req_au AFTER UPDATE ON isms_requirements BEGIN
 END;
 """
 
+# 초기 적재 동안만 쓰는 PRAGMA (행마다 fsync 하지 않도록)
+BULK_LOAD_PRAGMAS = r"""
+PRAGMA journal_mode = MEMORY;
+PRAGMA synchronous = OFF;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -65536;
+"""
+
+# 적재 후 평상시 운영 값으로 복원
+RUNTIME_PRAGMAS = r"""
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+"""
+
+# 다중 VALUES INSERT 1회당 최대 행 수 (SQLITE_MAX_VARIABLE_NUMBER=32766 / 컬럼 수)
+# created_at/updated_at은 행마다 datetime('now')를 부르지 않도록 적재 시각 1개를 바인딩
+SEED_COLUMNS = ('item_code', 'category', 'title', 'description', 'requirement', 'control_objective',
+                'created_at', 'updated_at')
+SEED_CHUNK_ROWS = 32766 // len(SEED_COLUMNS)
+
 SAMPLE_REQUIREMENTS = [
     # (네가 준 그대로 유지)
     ('1.1.1','관리체계 기반 마련','정책 수립','정보보호 및 개인정보보호 정책 수립',
@@ -171,25 +195,57 @@ SAMPLE_REQUIREMENTS = [
      '보유기간이 경과하거나 처리 목적이 달성된 개인정보는 안전하게 파기하여야 한다.','개인정보를 복구 불가능하게 파기한다'),
 ]
 
+def seed_requirements(conn, rows):
+    """rows를 다중 VALUES INSERT OR IGNORE 한 문장(청크당)으로 적재"""
+    # datetime('now')와 같은 UTC 'YYYY-MM-DD HH:MM:SS' 형식
+    now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    row_sql = "(" + ",".join("?" * len(SEED_COLUMNS)) + ")"
+    for start in range(0, len(rows), SEED_CHUNK_ROWS):
+        chunk = rows[start:start + SEED_CHUNK_ROWS]
+        conn.execute(
+            f"INSERT OR IGNORE INTO isms_requirements ({', '.join(SEED_COLUMNS)}) "
+            f"VALUES {','.join([row_sql] * len(chunk))}",
+            list(itertools.chain.from_iterable((*row, now, now) for row in chunk)),
+        )
+
 def init_database():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    with sqlite3.connect(DB_PATH) as conn:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # isolation_level=None: 트랜잭션 경계를 직접 BEGIN/COMMIT으로 관리
+    with sqlite3.connect(str(DB_PATH), isolation_level=None) as conn:
         conn.execute("PRAGMA foreign_keys = ON;")
-        conn.executescript(SCHEMA)
-
-        # 샘플 데이터
-        conn.executemany("""
-            INSERT OR IGNORE INTO isms_requirements
-            (item_code, category, title, description, requirement, control_objective)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, SAMPLE_REQUIREMENTS)
+        conn.executescript(BULK_LOAD_PRAGMAS)
 
-        # (선택) FTS5 시도
         try:
-            conn.executescript(FTS)
-        except sqlite3.Error:
-            # FTS5 미지원 환경이면 조용히 스킵
-            pass
+            # 테이블 + 샘플 데이터를 하나의 트랜잭션으로
+            # (executescript는 진행 중인 트랜잭션을 먼저 커밋하므로 BEGIN을 스크립트 안에 둔다)
+            conn.executescript("BEGIN IMMEDIATE;\n" + SCHEMA_TABLES)
+            try:
+                seed_requirements(conn, SAMPLE_REQUIREMENTS)
+                conn.execute("COMMIT;")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK;")
+                raise
+
+            # 적재가 끝난 뒤 인덱스 일괄 생성
+            conn.executescript("BEGIN IMMEDIATE;\n" + SCHEMA_INDEXES + "\nCOMMIT;")
+
+            # (선택) FTS5 시도
+            try:
+                conn.executescript("BEGIN IMMEDIATE;\n" + FTS + "\nCOMMIT;")
+            except sqlite3.Error:
+                # FTS5 미지원 환경이면 조용히 스킵
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK;")
+
+            # 플래너 통계(sqlite_stat1) 수집 → idx_req_category/idx_req_title 등 인덱스 선택에 활용
+            conn.execute("ANALYZE;")
+            conn.execute("PRAGMA optimize;")
+        finally:
+            # 적재/인덱스 생성 중 오류가 나도 연결을 안전한 모드(WAL/NORMAL)로 되돌림
+            # (executescript는 열린 트랜잭션을 먼저 커밋하므로 남은 트랜잭션은 롤백부터)
+            if conn.in_transaction:
+                conn.execute("ROLLBACK;")
+            conn.executescript(RUNTIME_PRAGMAS)
 
         # 간단한 확인
         cur = conn.execute("SELECT COUNT(*) FROM isms_requirements;")
@@ -199,7 +255,7 @@ def init_database():
         for row in conn.execute("SELECT item_code, title FROM isms_requirements ORDER BY item_code LIMIT 5;"):
             print(f"  - {row[0]}: {row[1]}")
 
-    print(f"\n📍 Database: {os.path.abspath(DB_PATH)}")
+    print(f"\n📍 Database: {DB_PATH.resolve()}")
     print("🎉 Initialization complete!")
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 #!/usr/bin/env python3
 """
 ISMS-P 증적 자동화를 위한 MCP 서버 (리팩터링판)
-- 비동기 안전: sqlite3 I/O는 모두 to_thread로 오프로딩
-- 스키마 호환: controls/control_sections 기반이면 isms_requirements VIEW를 자동 생성
+- 비동기 안전: sqlite3 I/O는 모두 공유 WAL 연결 + 전용 워커 스레드로 오프로딩
+- 스키마 호환: controls/control_sections 기반이면 isms_requirements 테이블로 구체화 (트리거로 동기화)
 - 초기화: evidences 테이블 없으면 생성
 """
 
@@ -11,10 +11,11 @@ import asyncio
 import logging
 import os
 import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from datetime import datetime
 from io import StringIO
-from typing import Any, Iterable, Optional
+from typing import Any, Callable, Iterable, Optional
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -28,6 +29,21 @@ logger = logging.getLogger("isms-p")
 
 DB_PATH = os.getenv("DB_PATH", "data/isms_p.db")
 
+# trigram 토큰은 3글자 단위라 더 짧은 키워드는 LIKE 스캔으로 처리
+FTS_MIN_KEYWORD = 3
+
+# 이 행 수만큼 쓰일 때마다 PRAGMA optimize (종료 시에도 1회)
+OPTIMIZE_EVERY_WRITES = 1000
+
+# 연결당 준비된 문장 캐시 크기 (기본 128)
+STATEMENT_CACHE_SIZE = 256
+
+# 검색 결과 최대 건수 (초과분은 잘렸다고 표시)
+SEARCH_LIMIT = 200
+
+# 대량 증적 등록 시 항목 코드 IN 조회 1회당 코드 수 (바인딩 변수 한도 이내)
+EVIDENCE_BATCH = 500
+
 # -----------------------
 # 서버 인스턴스
 # -----------------------
@@ -35,10 +51,22 @@ server = Server("isms-p")
 
 @dataclass(frozen=True)
 class SQL:
+    PRAGMAS = """
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA cache_size=-64000;
+        PRAGMA mmap_size=268435456;
+    """
     TABLES = """
         SELECT name FROM sqlite_master WHERE type='table';
     """
     HAS_TABLE = "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?;"
+    SCHEMA_OBJECTS = """
+        SELECT name, type FROM sqlite_master
+        WHERE type IN ('table','view')
+          AND name IN ('evidences','isms_requirements','controls','control_sections');
+    """
     CREATE_EVIDENCES = """
         CREATE TABLE evidences (
           id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -50,10 +78,15 @@ class SQL:
         );
     """
     INDEX_EVIDENCES = "CREATE INDEX IF NOT EXISTS idx_evidences_item_code ON evidences(item_code);"
+    # 항목별 최신 증적(ORDER BY created_at DESC LIMIT) · 기간 조회를 인덱스 범위 탐색으로
+    INDEX_EVIDENCES_CREATED = """
+        CREATE INDEX IF NOT EXISTS idx_evidences_item_code_created ON evidences(item_code, created_at DESC);
+        CREATE INDEX IF NOT EXISTS idx_evidences_created_at ON evidences(created_at);
+    """
 
-    # 네가 만든 DB(controls/control_sections)를 isms_requirements View로 노출
-    CREATE_REQ_VIEW = """
-        CREATE VIEW isms_requirements AS
+    # controls/control_sections 스키마 DB용: isms_requirements는 구체화 테이블로 만들고 트리거로 동기화
+    # controls/control_sections → isms_requirements 행 투영 (구체화 테이블 적재/갱신 공용)
+    REQ_FROM_CONTROLS = """
         SELECT
           c.control_id AS item_code,
           substr(c.control_id, 1, instr(c.control_id, '.') - 1) AS category,
@@ -74,58 +107,287 @@ class SQL:
             LIMIT 1
           ) AS requirement,
           NULL AS control_objective
-        FROM controls c;
+        FROM controls c
+    """
+    # 상관 서브쿼리를 조회마다 돌리지 않도록 실제 테이블로 1회 적재, 이후 트리거로 항목 단위 갱신
+    # (REPLACE는 recursive_triggers 없이는 삭제 트리거가 안 돌아 FTS가 어긋나므로 DELETE 후 INSERT)
+    MATERIALIZE_REQ = f"""
+        DROP VIEW IF EXISTS isms_requirements;
+        CREATE TABLE isms_requirements (
+          item_code TEXT PRIMARY KEY,
+          category TEXT,
+          title TEXT,
+          description TEXT,
+          requirement TEXT,
+          control_objective TEXT
+        );
+        INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS};
+        CREATE INDEX IF NOT EXISTS idx_req_category ON isms_requirements(category);
+
+        CREATE TRIGGER IF NOT EXISTS trg_controls_req_ai AFTER INSERT ON controls BEGIN
+          INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS} WHERE c.control_id = new.control_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_controls_req_ad AFTER DELETE ON controls BEGIN
+          DELETE FROM isms_requirements WHERE item_code = old.control_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_controls_req_au AFTER UPDATE ON controls BEGIN
+          DELETE FROM isms_requirements WHERE item_code IN (old.control_id, new.control_id);
+          INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS} WHERE c.control_id = new.control_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_sections_req_ai AFTER INSERT ON control_sections BEGIN
+          DELETE FROM isms_requirements WHERE item_code = new.control_id;
+          INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS} WHERE c.control_id = new.control_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_sections_req_ad AFTER DELETE ON control_sections BEGIN
+          DELETE FROM isms_requirements WHERE item_code = old.control_id;
+          INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS} WHERE c.control_id = old.control_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_sections_req_au AFTER UPDATE ON control_sections BEGIN
+          DELETE FROM isms_requirements WHERE item_code IN (old.control_id, new.control_id);
+          INSERT OR IGNORE INTO isms_requirements {REQ_FROM_CONTROLS}
+          WHERE c.control_id IN (old.control_id, new.control_id);
+        END;
+    """
+
+    # 요구사항 전문검색 (FTS5 trigram: LIKE '%kw%'와 같은 부분일치를 색인으로 처리)
+    # 외부 콘텐츠 테이블이라 본문은 isms_requirements에만 두고 트리거로 색인만 동기화
+    CREATE_REQ_FTS = """
+        CREATE VIRTUAL TABLE IF NOT EXISTS isms_requirements_search
+        USING fts5(category, title, description, requirement,
+                   content='isms_requirements', content_rowid='rowid', tokenize='trigram');
+
+        CREATE TRIGGER IF NOT EXISTS trg_req_search_ai AFTER INSERT ON isms_requirements BEGIN
+          INSERT INTO isms_requirements_search(rowid, category, title, description, requirement)
+          VALUES (new.rowid, new.category, new.title, new.description, new.requirement);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_req_search_ad AFTER DELETE ON isms_requirements BEGIN
+          INSERT INTO isms_requirements_search(isms_requirements_search, rowid, category, title, description, requirement)
+          VALUES ('delete', old.rowid, old.category, old.title, old.description, old.requirement);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_req_search_au AFTER UPDATE ON isms_requirements BEGIN
+          INSERT INTO isms_requirements_search(isms_requirements_search, rowid, category, title, description, requirement)
+          VALUES ('delete', old.rowid, old.category, old.title, old.description, old.requirement);
+          INSERT INTO isms_requirements_search(rowid, category, title, description, requirement)
+          VALUES (new.rowid, new.category, new.title, new.description, new.requirement);
+        END;
+    """
+    REBUILD_REQ_FTS = "INSERT INTO isms_requirements_search(isms_requirements_search) VALUES ('rebuild');"
+
+    # 도구 조회/저장 SQL (문자열을 고정해 연결의 statement 캐시를 재사용)
+    # 따옴표로 감싼 구문 검색 → 특수문자가 FTS 문법으로 해석되지 않음, 결과는 bm25 순
+    SEARCH_REQ_FTS = """
+        SELECT r.item_code, r.category, r.title, COALESCE(r.description,'') AS description,
+               COALESCE(r.requirement,'') AS requirement
+        FROM isms_requirements_search f
+        JOIN isms_requirements r ON r.rowid = f.rowid
+        WHERE isms_requirements_search MATCH ?
+        ORDER BY bm25(isms_requirements_search)
+        LIMIT ?;
+    """
+    # LIKE 검색: 키워드의 %, _, \ 는 ESCAPE로 문자 그대로 비교
+    SEARCH_REQ_LIKE = """
+        SELECT item_code, category, title, COALESCE(description,'') AS description,
+               COALESCE(requirement,'') AS requirement
+        FROM isms_requirements
+        WHERE title LIKE :term ESCAPE '\\' OR description LIKE :term ESCAPE '\\'
+           OR requirement LIKE :term ESCAPE '\\' OR category LIKE :term ESCAPE '\\'
+        ORDER BY item_code
+        LIMIT :limit;
+    """
+    GET_REQ = "SELECT * FROM isms_requirements WHERE item_code = ?;"
+    RECENT_EVIDENCES = """
+        SELECT evidence_type, content, created_at FROM evidences
+        WHERE item_code = ? ORDER BY created_at DESC LIMIT 5;
+    """
+    # 항목 존재 확인과 저장을 한 문장으로: 항목이 없으면 삽입 0건 → RETURNING 행 없음
+    # 저장된 created_at을 그대로 돌려받아 표시 (별도 시각 계산/재조회 없음)
+    INSERT_EVIDENCE_RETURNING = """
+        INSERT INTO evidences (item_code, evidence_type, content, status)
+        SELECT ?, ?, ?, 'completed'
+        WHERE EXISTS (SELECT 1 FROM isms_requirements WHERE item_code = ?)
+        RETURNING id, created_at;
+    """
+    INSERT_EVIDENCE = "INSERT INTO evidences (item_code, evidence_type, content, status) VALUES (?, ?, ?, 'completed');"
+    # 카테고리별 집계 한 번으로 전체 합계까지 계산
+    COMPLIANCE_BY_CAT = """
+        SELECT r.category AS category,
+               COUNT(DISTINCT r.item_code) AS total,
+               COUNT(DISTINCT e.item_code) AS completed
+        FROM isms_requirements r
+        LEFT JOIN evidences e ON r.item_code = e.item_code
+        GROUP BY r.category
+        ORDER BY r.category;
+    """
+    # category가 주어지면 해당 카테고리만 (idx_req_category 사용 가능한 등호 조건)
+    COMPLIANCE_ONE_CAT = """
+        SELECT r.category AS category,
+               COUNT(DISTINCT r.item_code) AS total,
+               COUNT(DISTINCT e.item_code) AS completed
+        FROM isms_requirements r
+        LEFT JOIN evidences e ON r.item_code = e.item_code
+        WHERE r.category = ?
+        GROUP BY r.category;
+    """
+    # 요구사항 수·기간 내 증적 확보 항목·증적 건수를 카테고리별 한 번의 집계로 계산
+    # 기간 조건은 DATE()로 감싸지 않은 반열림 구간이라 (item_code, created_at) 인덱스로 범위 탐색
+    AUDIT_BY_CAT = """
+        SELECT r.category AS category,
+               COUNT(DISTINCT r.item_code) AS total,
+               COUNT(DISTINCT e.item_code) AS cnt,
+               COUNT(e.item_code) AS evidences
+        FROM isms_requirements r
+        LEFT JOIN evidences e
+          ON r.item_code = e.item_code
+         AND e.created_at >= :start AND e.created_at < :end
+        GROUP BY r.category
+        ORDER BY r.category;
     """
 
 # -----------------------
 # DB 유틸
 # -----------------------
+# 공유 연결 + 전용 단일 워커: 호출마다 파일을 다시 열지 않고, 모든 sqlite3 I/O는 한 스레드에서 실행
+_conn: Optional[sqlite3.Connection] = None
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="isms-db")
+_write_lock = asyncio.Lock()
+_writes_since_optimize = 0
+
 def connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """공유 연결 반환 (최초 호출 시 열고 PRAGMA 적용).
+    DB 워커 스레드에서만 호출 → check_same_thread 기본값(True)으로 다른 스레드의 사용을 막음."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(DB_PATH, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row
+        conn.executescript(SQL.PRAGMAS)
+        _conn = conn
+    return _conn
+
+async def _submit(work: Callable[[], Any]) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, work)
+
+def _optimize() -> None:
+    # 변경이 많았던 테이블만 ANALYZE → 증적이 늘어도 플래너가 인덱스를 계속 선택
+    connect().execute("PRAGMA optimize;")
+
+async def _submit_write(work: Callable[[], Any], rows: int = 1) -> Any:
+    """쓰기 직렬화 + 누적 쓰기 행 수가 OPTIMIZE_EVERY_WRITES를 넘으면 PRAGMA optimize"""
+    global _writes_since_optimize
+    async with _write_lock:
+        result = await _submit(work)
+        _writes_since_optimize += rows
+        if _writes_since_optimize >= OPTIMIZE_EVERY_WRITES:
+            _writes_since_optimize = 0
+            await _submit(_optimize)
+    return result
+
+async def close_db() -> None:
+    """종료 시 플래너 통계 갱신 후 공유 연결 닫기"""
+    def _work():
+        global _conn
+        if _conn is not None:
+            try:
+                _optimize()
+            finally:
+                _conn.close()
+                _conn = None
+    try:
+        await _submit(_work)
+    finally:
+        _db_executor.shutdown(wait=True)
 
 async def run_read(query: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
+    def _work():
+        return connect().execute(query, params).fetchall()
+    return await _submit(_work)
+
+async def run_read_tuples(query: str, params: Iterable[Any] = ()) -> list[tuple[Any, ...]]:
+    """열 순서대로 언패킹할 집계 결과용: 커서 단위로 row_factory를 끄고 일반 튜플로 반환"""
+    def _work():
+        cur = connect().cursor()
+        cur.row_factory = None
+        return cur.execute(query, params).fetchall()
+    return await _submit(_work)
+
+async def run_write_returning(query: str, params: Iterable[Any] = ()) -> Optional[sqlite3.Row]:
+    """INSERT ... RETURNING 결과 행을 커밋 전에 읽어 반환 (SQLite 3.35+)"""
     def _work():
         with connect() as c:
-            cur = c.execute(query, params)
-            return cur.fetchall()
-    return await asyncio.to_thread(_work)
+            return c.execute(query, params).fetchone()
+    return await _submit_write(_work)
 
-async def run_write(query: str, params: Iterable[Any] = ()) -> int:
+async def run_write_many(query: str, rows: list[tuple[Any, ...]]) -> int:
+    """여러 행을 하나의 트랜잭션(BEGIN IMMEDIATE ... COMMIT)에서 executemany로 저장"""
     def _work():
         with connect() as c:
-            cur = c.execute(query, params)
-            c.commit()
-            return cur.lastrowid
-    return await asyncio.to_thread(_work)
+            c.execute("BEGIN IMMEDIATE;")
+            return c.executemany(query, rows).rowcount
+    return await _submit_write(_work, len(rows))
 
 async def run_script(script: str) -> None:
     def _work():
         with connect() as c:
             c.executescript(script)
-            c.commit()
-    await asyncio.to_thread(_work)
+    await _submit_write(_work, 0)
 
 async def table_exists(name: str) -> bool:
     rows = await run_read(SQL.HAS_TABLE, (name,))
     return bool(rows)
 
+# FTS 사용 가능 여부 (None: 아직 확인 전)
+_fts_ready: Optional[bool] = None
+
+async def fts5_available() -> bool:
+    rows = await run_read("PRAGMA compile_options;")
+    return any(row[0] == "ENABLE_FTS5" for row in rows)
+
+async def ensure_fts() -> bool:
+    """isms_requirements 전문검색 색인 생성 (최초 생성 시 기존 행 색인). 불가하면 False → LIKE 검색."""
+    if not await fts5_available():
+        logger.warning("SQLite built without FTS5; search_requirements falls back to LIKE.")
+        return False
+    created = not await table_exists("isms_requirements_search")
+    if created:
+        logger.info("Building 'isms_requirements_search' FTS index...")
+    try:
+        # 색인 생성과 최초 적재를 한 트랜잭션으로
+        await run_script("BEGIN IMMEDIATE;\n" + SQL.CREATE_REQ_FTS
+                         + (SQL.REBUILD_REQ_FTS if created else "") + "\nCOMMIT;")
+    except sqlite3.Error as e:
+        logger.warning("FTS index unavailable (%s); search_requirements falls back to LIKE.", e)
+        return False
+    return True
+
+# 스키마 준비 완료 여부 (프로세스당 1회만 확인)
+_schema_ready = False
+
 async def ensure_schema() -> None:
-    """실행 시 스키마 호환/초기화: evidences 없으면 생성, isms_requirements 없으면 VIEW 생성."""
+    """실행 시 스키마 호환/초기화: evidences 없으면 생성, isms_requirements 없으면(또는 VIEW면) 테이블로 구체화."""
+    global _schema_ready, _fts_ready
+    if _schema_ready:
+        return
+    # sqlite_master 한 번 조회로 필요한 객체 존재 여부 확인 (name → 'table' | 'view')
+    objects = {row["name"]: row["type"] for row in await run_read(SQL.SCHEMA_OBJECTS)}
+
+    # 필요한 DDL을 모아 한 트랜잭션·한 번의 executescript로 실행
+    ddl: list[str] = []
+
     # evidences
-    if not await table_exists("evidences"):
+    if "evidences" not in objects:
         logger.info("Creating 'evidences' table...")
-        await run_script(SQL.CREATE_EVIDENCES)
-        await run_write(SQL.INDEX_EVIDENCES)
-
-    # requirements
-    has_isms_req = await table_exists("isms_requirements")
-    if not has_isms_req:
-        # controls/control_sections 기반이면 View 생성
-        if await table_exists("controls") and await table_exists("control_sections"):
-            logger.info("Creating 'isms_requirements' VIEW from controls/control_sections...")
-            await run_script(SQL.CREATE_REQ_VIEW)
+        ddl += [SQL.CREATE_EVIDENCES, SQL.INDEX_EVIDENCES]
+    # 기존 DB에도 적용되도록 매 기동 시 확인 (IF NOT EXISTS)
+    ddl.append(SQL.INDEX_EVIDENCES_CREATED)
+
+    # requirements (이전 버전이 만든 VIEW도 테이블로 교체)
+    if objects.get("isms_requirements") != "table":
+        # controls/control_sections 기반이면 테이블로 구체화
+        if "controls" in objects and "control_sections" in objects:
+            logger.info("Materializing 'isms_requirements' from controls/control_sections...")
+            ddl.append(SQL.MATERIALIZE_REQ)
+            objects["isms_requirements"] = "table"
         else:
             # 진짜 테이블이 있다고 가정하는 경우는 그냥 넘어감(외부에서 제공)
             logger.warning(
@@ -133,9 +395,21 @@ async def ensure_schema() -> None:
                 "Provide your own 'isms_requirements' table if needed."
             )
 
+    await run_script("BEGIN IMMEDIATE;\n" + "\n".join(ddl) + "\nCOMMIT;")
+
+    # 전문검색: 트리거를 걸 수 있는 실제 테이블일 때만 (VIEW면 LIKE 검색)
+    if _fts_ready is None and objects.get("isms_requirements") == "table":
+        _fts_ready = await ensure_fts()
+    _schema_ready = True
+
 # -----------------------
 # 포맷 유틸
 # -----------------------
+# 구분선은 모듈 로드 시 1회만 생성
+DASH60 = "-" * 60
+SEP60 = "=" * 60
+SEARCH_SEP = "\n" + DASH60 + "\n\n"
+
 def fmt_error(msg: str) -> list[TextContent]:
     return [TextContent(type="text", text=f"❌ {msg}")]
 
@@ -148,71 +422,96 @@ def safe_strip(s: Optional[str]) -> str:
 # -----------------------
 # Tools 정의
 # -----------------------
-@server.list_tools()
-async def list_tools() -> list[Tool]:
-    return [
-        Tool(
-            name="search_requirements",
-            description="ISMS-P 인증기준 항목을 키워드로 검색합니다. 예: '접근권한', '로그', '암호화'",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "keyword": {"type": "string", "description": "검색 키워드"}
-                },
-                "required": ["keyword"]
-            }
-        ),
-        Tool(
-            name="get_requirement_detail",
-            description="특정 ISMS-P 인증기준 항목의 상세 정보를 조회합니다. 예: '2.10.2'",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "item_code": {"type": "string", "description": "항목 코드 (예: 2.10.2)"}
-                },
-                "required": ["item_code"]
-            }
-        ),
-        Tool(
-            name="generate_evidence",
-            description="특정 항목에 대한 증적(문서/로그/스크린샷 등)을 저장합니다.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "item_code": {"type": "string"},
-                    "evidence_type": {"type": "string"},
-                    "content": {"type": "string"}
-                },
-                "required": ["item_code", "evidence_type", "content"]
-            }
-        ),
-        Tool(
-            name="check_compliance",
-            description="증적 현황 기반으로 준수율을 집계합니다. category를 주면 해당 영역만 계산.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "category": {"type": "string"}
+# 고정 데이터라 import 시 1회만 생성
+_TOOLS: list[Tool] = [
+    Tool(
+        name="search_requirements",
+        description="ISMS-P 인증기준 항목을 키워드로 검색합니다. 예: '접근권한', '로그', '암호화'",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "keyword": {"type": "string", "description": "검색 키워드"}
+            },
+            "required": ["keyword"]
+        }
+    ),
+    Tool(
+        name="get_requirement_detail",
+        description="특정 ISMS-P 인증기준 항목의 상세 정보를 조회합니다. 예: '2.10.2'",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "item_code": {"type": "string", "description": "항목 코드 (예: 2.10.2)"}
+            },
+            "required": ["item_code"]
+        }
+    ),
+    Tool(
+        name="generate_evidence",
+        description="특정 항목에 대한 증적(문서/로그/스크린샷 등)을 저장합니다.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "item_code": {"type": "string"},
+                "evidence_type": {"type": "string"},
+                "content": {"type": "string"}
+            },
+            "required": ["item_code", "evidence_type", "content"]
+        }
+    ),
+    Tool(
+        name="generate_evidences_bulk",
+        description="여러 증적을 한 번에 저장합니다. 존재하지 않는 항목 코드는 건너뜁니다.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "item_code": {"type": "string"},
+                            "evidence_type": {"type": "string"},
+                            "content": {"type": "string"}
+                        },
+                        "required": ["item_code", "evidence_type", "content"]
+                    }
                 }
+            },
+            "required": ["items"]
+        }
+    ),
+    Tool(
+        name="check_compliance",
+        description="증적 현황 기반으로 준수율을 집계합니다. category를 주면 해당 영역만 계산.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "category": {"type": "string"}
             }
-        ),
-        Tool(
-            name="create_audit_report",
-            description="기간별 감사 보고서를 생성합니다. (YYYY-MM-DD ~ YYYY-MM-DD)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "start_date": {"type": "string"},
-                    "end_date": {"type": "string"}
-                }
+        }
+    ),
+    Tool(
+        name="create_audit_report",
+        description="기간별 감사 보고서를 생성합니다. (YYYY-MM-DD ~ YYYY-MM-DD)",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string"},
+                "end_date": {"type": "string"}
             }
-        ),
-    ]
+        }
+    ),
+]
+
+@server.list_tools()
+async def list_tools() -> list[Tool]:
+    return _TOOLS
 
 @server.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
     try:
-        # 스키마 보장
+        # 스키마 보장 (main()에서 이미 끝났으면 즉시 반환)
         await ensure_schema()
 
         if name == "search_requirements":
@@ -228,6 +527,9 @@ async def call_tool(name: str, arguments: Any) -> list[TextContent]:
                 safe_strip(arguments.get("content", "")),
             )
 
+        if name == "generate_evidences_bulk":
+            return await tool_generate_evidences_bulk(arguments.get("items"))
+
         if name == "check_compliance":
             cat = arguments.get("category")
             return await tool_check_compliance(safe_strip(cat) if cat else None)
@@ -251,43 +553,41 @@ async def tool_search_requirements(keyword: str) -> list[TextContent]:
     if not keyword:
         return fmt_error("검색어를 입력해 주세요.")
 
-    q = """
-        SELECT item_code, category, title, COALESCE(description,'') AS description,
-               COALESCE(requirement,'') AS requirement
-        FROM isms_requirements
-        WHERE title LIKE ? OR description LIKE ? OR requirement LIKE ? OR category LIKE ?
-        ORDER BY item_code;
-    """
-    term = f"%{keyword}%"
-    rows = await run_read(q, (term, term, term, term))
+    if _fts_ready and len(keyword) >= FTS_MIN_KEYWORD:
+        rows = await run_read(SQL.SEARCH_REQ_FTS, ('"' + keyword.replace('"', '""') + '"', SEARCH_LIMIT + 1))
+    else:
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = await run_read(SQL.SEARCH_REQ_LIKE, {"term": f"%{escaped}%", "limit": SEARCH_LIMIT + 1})
     if not rows:
         return fmt_text([f"🔍 '{keyword}' 로 검색된 항목이 없습니다.\n"])
 
-    out = StringIO()
-    out.write(f"🔍 '{keyword}' 검색 결과: {len(rows)}개 항목\n\n")
+    # LIMIT+1로 조회해 초과 여부만 판단
+    truncated = len(rows) > SEARCH_LIMIT
+    rows = rows[:SEARCH_LIMIT]
+    parts = [f"🔍 '{keyword}' 검색 결과: {len(rows)}개 항목\n\n"]
     for r in rows:
-        out.write(f"**[{r['item_code']}] {r['title']}**\n")
+        parts.append("**[%s] %s**\n" % (r["item_code"], r["title"]))
         if r["category"]:
-            out.write(f"📁 카테고리: {r['category']}\n")
+            parts.append("📁 카테고리: %s\n" % r["category"])
         if r["description"]:
-            out.write(f"📝 설명: {r['description']}\n")
+            parts.append("📝 설명: %s\n" % r["description"])
         if r["requirement"]:
-            out.write(f"📋 요구사항: {r['requirement']}\n")
-        out.write("\n" + "-" * 60 + "\n\n")
-    return fmt_text([out.getvalue()])
+            parts.append("📋 요구사항: %s\n" % r["requirement"])
+        parts.append(SEARCH_SEP)
+    if truncated:
+        parts.append(f"… 결과가 많아 상위 {SEARCH_LIMIT}개만 표시했습니다. 검색어를 구체화해 주세요.\n")
+    return fmt_text(parts)
 
 async def tool_get_requirement_detail(item_code: str) -> list[TextContent]:
     if not item_code:
         return fmt_error("항목 코드를 입력해 주세요. (예: 2.10.2)")
 
-    row = (await run_read("SELECT * FROM isms_requirements WHERE item_code = ?;", (item_code, )))
+    row = await run_read(SQL.GET_REQ, (item_code,))
     if not row:
         return fmt_error(f"항목 코드 '{item_code}'를 찾을 수 없습니다.")
     r = row[0]
 
-    ev = await run_read(
-        "SELECT evidence_type, content, created_at FROM evidences WHERE item_code = ? ORDER BY created_at DESC LIMIT 5;",
-        (item_code,))
+    ev = await run_read(SQL.RECENT_EVIDENCES, (item_code,))
     out = StringIO()
     out.write("📋 **ISMS-P 요구사항 상세정보**\n\n")
     out.write(f"**항목 코드:** {r['item_code']}\n")
@@ -316,47 +616,60 @@ async def tool_generate_evidence(item_code: str, evidence_type: str, content: st
     if not (item_code and evidence_type and content):
         return fmt_error("item_code, evidence_type, content는 필수입니다.")
 
-    # 항목 존재 확인
-    exists = await run_read("SELECT 1 FROM isms_requirements WHERE item_code = ?;", (item_code,))
-    if not exists:
+    row = await run_write_returning(SQL.INSERT_EVIDENCE_RETURNING, (item_code, evidence_type, content, item_code))
+    if row is None:
         return fmt_error(f"항목 코드 '{item_code}'를 찾을 수 없습니다.")
-
-    eid = await run_write(
-        "INSERT INTO evidences (item_code, evidence_type, content, status) VALUES (?, ?, ?, 'completed');",
-        (item_code, evidence_type, content)
-    )
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     out = (
         "✅ 증적이 성공적으로 생성되었습니다!\n\n"
-        f"**증적 ID:** {eid}\n"
+        f"**증적 ID:** {row['id']}\n"
         f"**항목:** [{item_code}]\n"
         f"**유형:** {evidence_type}\n"
         f"**내용:** {content[:200]}...\n"
-        f"**생성일시:** {now}\n"
+        f"**생성일시:** {row['created_at']}\n"
     )
     return fmt_text([out])
 
+async def tool_generate_evidences_bulk(items: Any) -> list[TextContent]:
+    if not isinstance(items, list) or not items:
+        return fmt_error("items는 {item_code, evidence_type, content} 객체의 배열이어야 합니다.")
+
+    rows = []
+    for it in items:
+        it = it if isinstance(it, dict) else {}
+        row = (safe_strip(it.get("item_code")), safe_strip(it.get("evidence_type")), safe_strip(it.get("content")))
+        if not all(row):
+            return fmt_error("모든 항목에 item_code, evidence_type, content가 필요합니다.")
+        rows.append(row)
+
+    # 항목 존재 확인: 코드별 조회 대신 IN 조회 (EVIDENCE_BATCH개씩)
+    codes = list(dict.fromkeys(code for code, _, _ in rows))
+    valid: set[str] = set()
+    for i in range(0, len(codes), EVIDENCE_BATCH):
+        chunk = codes[i:i + EVIDENCE_BATCH]
+        found = await run_read(
+            f"SELECT item_code FROM isms_requirements WHERE item_code IN ({','.join('?' * len(chunk))});",
+            chunk,
+        )
+        valid.update(r["item_code"] for r in found)
+
+    saved = await run_write_many(SQL.INSERT_EVIDENCE, [row for row in rows if row[0] in valid])
+    missing = [code for code in codes if code not in valid]
+    out = StringIO()
+    out.write("✅ 증적 일괄 등록 완료\n\n")
+    out.write(f"**요청:** {len(rows)}건\n")
+    out.write(f"**저장:** {saved}건\n")
+    if missing:
+        out.write(f"**건너뜀(존재하지 않는 항목):** {', '.join(missing)}\n")
+    return fmt_text([out.getvalue()])
+
 async def tool_check_compliance(category: Optional[str] = None) -> list[TextContent]:
+    # (category, total, completed)
     if category:
-        total = (await run_read("SELECT COUNT(*) AS n FROM isms_requirements WHERE category = ?;", (category,)))[0]["n"]
-        with_ev = (await run_read("""
-            SELECT COUNT(DISTINCT r.item_code) AS n
-            FROM isms_requirements r
-            JOIN evidences e ON r.item_code = e.item_code
-            WHERE r.category = ?;""", (category,)))[0]["n"]
+        by_cat = await run_read_tuples(SQL.COMPLIANCE_ONE_CAT, (category,))
     else:
-        total = (await run_read("SELECT COUNT(*) AS n FROM isms_requirements;"))[0]["n"]
-        with_ev = (await run_read("SELECT COUNT(DISTINCT item_code) AS n FROM evidences;"))[0]["n"]
-
-    by_cat = await run_read("""
-        SELECT r.category AS category,
-               COUNT(DISTINCT r.item_code) AS total,
-               COUNT(DISTINCT e.item_code) AS completed
-        FROM isms_requirements r
-        LEFT JOIN evidences e ON r.item_code = e.item_code
-        GROUP BY r.category
-        ORDER BY r.category;
-    """)
+        by_cat = await run_read_tuples(SQL.COMPLIANCE_BY_CAT)
+    total = sum(n for _, n, _ in by_cat)
+    with_ev = sum(done for _, _, done in by_cat)
 
     rate = (with_ev / total * 100) if total else 0.0
     out = StringIO()
@@ -367,42 +680,29 @@ async def tool_check_compliance(category: Optional[str] = None) -> list[TextCont
     out.write(f"**미비:** {total - with_ev}개\n")
     out.write(f"**준수율:** {rate:.1f}%\n\n")
     out.write("**📁 카테고리별 현황:**\n\n")
-    for r in by_cat:
-        cat_rate = (r["completed"] / r["total"] * 100) if r["total"] else 0.0
+    for cat, cat_total, cat_done in by_cat:
+        cat_rate = (cat_done / cat_total * 100) if cat_total else 0.0
         status = "✅" if cat_rate >= 80 else "⚠️" if cat_rate >= 50 else "❌"
-        out.write(f"{status} {r['category']}: {r['completed']}/{r['total']} ({cat_rate:.0f}%)\n")
+        out.write(f"{status} {cat}: {cat_done}/{cat_total} ({cat_rate:.0f}%)\n")
     return fmt_text([out.getvalue()])
 
 async def tool_create_audit_report(start_date: Optional[str], end_date: Optional[str]) -> list[TextContent]:
     if not end_date:
-        end_date = datetime.now().strftime("%Y-%m-%d")
+        end_date = time.strftime("%Y-%m-%d")
     if not start_date:
         start_date = "2020-01-01"
 
-    total_req = (await run_read("SELECT COUNT(*) AS n FROM isms_requirements;"))[0]["n"]
-    completed = (await run_read("""
-        SELECT COUNT(DISTINCT r.item_code) AS n
-        FROM isms_requirements r
-        JOIN evidences e ON r.item_code = e.item_code
-        WHERE DATE(e.created_at) BETWEEN ? AND ?;
-    """, (start_date, end_date)))[0]["n"]
-    total_evidences = (await run_read("""
-        SELECT COUNT(*) AS n FROM evidences
-        WHERE DATE(created_at) BETWEEN ? AND ?;
-    """, (start_date, end_date)))[0]["n"]
-    by_cat = await run_read("""
-        SELECT r.category, COUNT(DISTINCT e.item_code) AS cnt
-        FROM isms_requirements r
-        LEFT JOIN evidences e ON r.item_code = e.item_code
-        WHERE DATE(e.created_at) BETWEEN ? AND ?
-        GROUP BY r.category;
-    """, (start_date, end_date))
+    # (category, total, cnt, evidences)
+    by_cat = await run_read_tuples(SQL.AUDIT_BY_CAT, {"start": start_date, "end": f"{end_date} 24:00:00"})
+    total_req = sum(n for _, n, _, _ in by_cat)
+    completed = sum(cnt for _, _, cnt, _ in by_cat)
+    total_evidences = sum(ev for _, _, _, ev in by_cat)
 
     out = StringIO()
     out.write("📄 **ISMS-P 감사 보고서**\n\n")
     out.write(f"**기간:** {start_date} ~ {end_date}\n")
-    out.write(f"**생성일시:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-    out.write("=" * 60 + "\n\n")
+    out.write(f"**생성일시:** {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    out.write(SEP60 + "\n\n")
     out.write("**📊 전체 현황**\n\n")
     out.write(f"- 전체 요구사항: {total_req}개\n")
     out.write(f"- 증적 확보 항목: {completed}개\n")
@@ -410,9 +710,10 @@ async def tool_create_audit_report(start_date: Optional[str], end_date: Optional
     out.write(f"- 총 증적 수: {total_evidences}건\n")
     out.write(f"- 준수율: {(completed/total_req*100):.1f}%\n\n" if total_req else "- 준수율: 0.0%\n\n")
     out.write("**📁 카테고리별 현황**\n\n")
-    for r in by_cat:
-        out.write(f"- {r['category']}: {r['cnt']}개 항목 완료\n")
-    out.write("\n" + "=" * 60 + "\n\n")
+    for cat, _, cnt, _ in by_cat:
+        if cnt:
+            out.write(f"- {cat}: {cnt}개 항목 완료\n")
+    out.write("\n" + SEP60 + "\n\n")
     out.write("**💡 권장사항**\n\n")
     if total_req and completed < total_req * 0.5:
         out.write("⚠️ 증적 확보율이 50% 미만입니다. 증적 수집을 강화하세요.\n")
@@ -426,8 +727,13 @@ async def tool_create_audit_report(start_date: Optional[str], end_date: Optional
 # 메인
 # -----------------------
 async def main():
-    async with stdio_server() as (r, w):
-        await server.run(r, w, server.create_initialization_options())
+    # 스키마 준비가 실패해도 finally에서 연결/DB 스레드를 정리
+    try:
+        await ensure_schema()
+        async with stdio_server() as (r, w):
+            await server.run(r, w, server.create_initialization_options())
+    finally:
+        await close_db()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -8,11 +8,18 @@ ISMS-P 증적 자동화를 위한 MCP 서버 (refactored)
 from __future__ import annotations
 
 import asyncio
+import atexit
+import itertools
 import os
 import sqlite3
+import threading
+import types
+from collections import defaultdict
 from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any, Iterable
+from typing import Any, Iterable, Iterator, Mapping, Sequence
 
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
@@ -22,6 +29,201 @@ from mcp.types import Tool, TextContent
 DEFAULT_DB = Path(__file__).resolve().parent.parent / "data" / "isms_p.db"
 DB_PATH = Path(os.getenv("ISMS_DB_PATH", str(DEFAULT_DB)))
 
+# 이 서버의 검색/FTS/준수 현황 쿼리가 읽는 isms_requirements 컬럼
+# (database/init_db.py의 title 스키마 DB에는 item_title이 없으므로 시작 시 거부)
+REQUIRED_REQ_COLUMNS = frozenset({"item_code", "item_title", "category", "description"})
+
+# 연결당 prepared statement 캐시 크기 (기본 128)
+STATEMENT_CACHE_SIZE = 256
+
+# 연결 생성 시 1회만 적용하는 PRAGMA
+CONN_PRAGMAS = """
+PRAGMA foreign_keys = ON;
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+PRAGMA cache_size = -65536;
+PRAGMA temp_store = MEMORY;
+PRAGMA mmap_size = 134217728;
+"""
+
+# 요구사항 전문검색 (FTS5 trigram: LIKE '%kw%'와 같은 부분일치를 인덱스로 처리)
+# 외부 콘텐츠 테이블이라 본문은 isms_requirements에만 저장되고, 트리거로 색인만 동기화
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS isms_req_fts
+USING fts5(item_title, description, category,
+           content='isms_requirements', content_rowid='rowid', tokenize='trigram');
+
+CREATE TRIGGER IF NOT EXISTS trg_req_fts_ai AFTER INSERT ON isms_requirements BEGIN
+  INSERT INTO isms_req_fts(rowid, item_title, description, category)
+  VALUES (new.rowid, new.item_title, new.description, new.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_req_fts_ad AFTER DELETE ON isms_requirements BEGIN
+  INSERT INTO isms_req_fts(isms_req_fts, rowid, item_title, description, category)
+  VALUES ('delete', old.rowid, old.item_title, old.description, old.category);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_req_fts_au AFTER UPDATE ON isms_requirements BEGIN
+  INSERT INTO isms_req_fts(isms_req_fts, rowid, item_title, description, category)
+  VALUES ('delete', old.rowid, old.item_title, old.description, old.category);
+  INSERT INTO isms_req_fts(rowid, item_title, description, category)
+  VALUES (new.rowid, new.item_title, new.description, new.category);
+END;
+"""
+
+# 검색 결과 상한 (매칭 행 전체를 포맷하지 않도록 SQL LIMIT으로 제한)
+SEARCH_LIMIT = 50
+
+# trigram 토큰은 3글자 단위라 더 짧은 키워드는 LIKE 스캔으로 처리
+FTS_MIN_KEYWORD = 3
+
+# 비어 있는 DB에 넣는 최소 샘플 (item_code, chapter, category, item_title, description, check_items, related_laws)
+SAMPLE_REQUIREMENTS: tuple[tuple[str, ...], ...] = (
+    (
+        "1.1.1",
+        "1. 관리체계 수립 및 운영",
+        "1.1 관리체계 기반 마련",
+        "경영진 참여",
+        "최고경영자는 정보보호 및 개인정보보호 관리체계 수립과 운영에 적극 참여하여야 한다.",
+        "최고경영자의 정보보호 및 개인정보보호 관련 의사결정 참여 여부",
+        "개인정보보호법 제29조",
+    ),
+    (
+        "1.1.2",
+        "1. 관리체계 수립 및 운영",
+        "1.1 관리체계 기반 마련",
+        "최고책임자 지정",
+        "정보보호 및 개인정보보호 관리체계를 총괄하는 최고책임자를 지정하여야 한다.",
+        "정보보호 및 개인정보보호 최고책임자 지정 여부",
+        "개인정보보호법 제31조",
+    ),
+    (
+        "2.1.1",
+        "2. 보호대책 요구사항",
+        "2.1 정책, 조직, 자산 관리",
+        "정책의 유지관리",
+        "정보보호 및 개인정보보호 정책을 정기적으로 검토하고 필요시 개정하여야 한다.",
+        "정책 검토 및 개정 이력",
+        "정보통신망법 제45조",
+    ),
+    (
+        "2.7.1",
+        "2. 보호대책 요구사항",
+        "2.7 암호화 적용",
+        "암호정책 수립 및 적용",
+        "암호 사용에 대한 정책을 수립하고 암호키 관리절차를 포함하여야 한다.",
+        "암호정책 수립 및 적용 여부",
+        "개인정보보호법 제29조",
+    ),
+)
+
+# ----- SQL -----
+# 고정 문자열이라 연결의 statement cache에서 재사용됨 (호출마다 parse/plan하지 않음)
+SQL_SEARCH_FTS = """
+SELECT r.item_code, r.item_title, r.description, r.category
+FROM isms_req_fts f
+JOIN isms_requirements r ON r.rowid = f.rowid
+WHERE isms_req_fts MATCH ?
+ORDER BY bm25(isms_req_fts)
+LIMIT ?
+"""
+
+# MATCH와 일반 필터를 한 WHERE에 섞으면 플래너가 FTS 색인을 버릴 수 있어
+# 후보를 CTE에서 먼저 뽑고 카테고리는 바깥에서 거른다
+SQL_SEARCH_FTS_CATEGORY = """
+WITH fts_matches AS (
+    SELECT rowid, bm25(isms_req_fts) AS rank
+    FROM isms_req_fts
+    WHERE isms_req_fts MATCH ?
+    ORDER BY rank
+    LIMIT ? * 10
+)
+SELECT r.item_code, r.item_title, r.description, r.category
+FROM fts_matches m
+JOIN isms_requirements r ON r.rowid = m.rowid
+WHERE r.category LIKE ?
+ORDER BY m.rank
+LIMIT ?
+"""
+
+SQL_SEARCH_LIKE = """
+SELECT item_code, item_title, description, category
+FROM isms_requirements
+WHERE item_title LIKE ? OR description LIKE ? OR category LIKE ?
+ORDER BY item_code
+LIMIT ?
+"""
+
+SQL_SEARCH_LIKE_CATEGORY = """
+SELECT item_code, item_title, description, category
+FROM isms_requirements
+WHERE (item_title LIKE ? OR description LIKE ? OR category LIKE ?)
+  AND category LIKE ?
+ORDER BY item_code
+LIMIT ?
+"""
+
+SQL_GET_REQUIREMENT = "SELECT * FROM isms_requirements WHERE item_code = ?"
+
+SQL_RECENT_EVIDENCES = """
+SELECT evidence_type, content, created_at
+FROM evidence_logs
+WHERE item_code = ?
+ORDER BY created_at DESC
+LIMIT ?
+"""
+
+# 항목이 있을 때만 삽입하고 저장된 id/created_at과 항목명을 함께 반환
+SQL_INSERT_EVIDENCE = """
+WITH r AS (SELECT item_title FROM isms_requirements WHERE item_code = ?)
+INSERT INTO evidence_logs (item_code, evidence_type, content)
+SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM r)
+RETURNING id, created_at, (SELECT item_title FROM r) AS item_title
+"""
+
+SQL_COMPLIANCE = """
+SELECT r.item_code, r.item_title, COUNT(e.id) AS c
+FROM isms_requirements r
+LEFT JOIN evidence_logs e ON e.item_code = r.item_code
+GROUP BY r.item_code
+ORDER BY r.item_code
+"""
+
+SQL_COMPLIANCE_CATEGORY = """
+SELECT r.item_code, r.item_title, COUNT(e.id) AS c
+FROM isms_requirements r
+LEFT JOIN evidence_logs e ON e.item_code = r.item_code
+WHERE r.category LIKE ?
+GROUP BY r.item_code
+ORDER BY r.item_code
+"""
+
+# 보고서용: 항목별 최근 증적 N건 + 항목별 증적 수(item_count)
+# 기간 유무 두 형태를 미리 만들어 두어 둘 다 statement cache에 남는다
+_SQL_EVLOGS = """
+SELECT e.item_code, r.item_title, e.evidence_type, e.content, e.created_at, e.item_count
+FROM (
+    SELECT item_code, evidence_type, content, created_at,
+           ROW_NUMBER() OVER (PARTITION BY item_code ORDER BY created_at DESC, id DESC) AS rn,
+           COUNT(*) OVER (PARTITION BY item_code) AS item_count,
+           MAX(created_at) OVER (PARTITION BY item_code) AS last_at
+    FROM evidence_logs
+    {where}
+) e
+LEFT JOIN isms_requirements r ON r.item_code = e.item_code
+WHERE e.rn <= ?
+ORDER BY e.last_at DESC, e.item_code, e.rn
+"""
+SQL_EVLOGS_ALL = _SQL_EVLOGS.format(where="")
+# 컬럼에 함수를 씌우지 않은 범위 조건이라 idx_ev_created_at으로 range scan
+SQL_EVLOGS_RANGE = _SQL_EVLOGS.format(where="WHERE created_at >= ? AND created_at < ?")
+
+# 인자 없이 호출된 도구가 공유하는 읽기 전용 빈 매핑
+_EMPTY: Mapping[str, Any] = types.MappingProxyType({})
+
+# 보고서에서 항목별로 보여줄 최근 증적 수
+REPORT_PREVIEW_PER_ITEM = 3
+
 # ----- MCP Server -----
 app = Server("isms-p-server")
 
@@ -29,22 +231,62 @@ app = Server("isms-p-server")
 # =========================
 # DB Utilities & Init
 # =========================
+# to_thread 워커 스레드마다 연결 1개를 열어 재사용 (페이지 캐시 유지, WAL이라 읽기는 병렬)
+_local = threading.local()
+_conns: list[sqlite3.Connection] = []
+_conns_lock = threading.Lock()
+_write_lock = threading.Lock()
+_fts_ready = False
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's SQLite connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # 종료 시 메인 스레드에서 일괄 close하므로 check_same_thread=False
+        # 고정 SQL 문자열은 연결의 statement cache에서 재사용 (parse/plan 1회)
+        conn = sqlite3.connect(
+            DB_PATH,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.executescript(CONN_PRAGMAS)
+        _local.conn = conn
+        with _conns_lock:
+            _conns.append(conn)
+    return conn
+
+
+@atexit.register
+def _close_connections() -> None:
+    with _conns_lock:
+        while _conns:
+            _conns.pop().close()
+
+
 @contextmanager
 def get_conn():
-    """Create a SQLite connection with sane defaults."""
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA foreign_keys = ON")
-        yield conn
-        conn.commit()
-    finally:
-        conn.close()
+    """Yield the calling thread's SQLite connection (autocommit mode, never closed per call)."""
+    yield _connect()
 
 
-def _exec_many(conn: sqlite3.Connection, sql: str, rows: Iterable[Iterable[Any]]) -> None:
-    conn.executemany(sql, list(rows))
+@contextmanager
+def transaction():
+    """Run writes inside BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error).
+
+    쓰기 락을 시작 시점에 한 번에 잡아 WAL 모드에서 중간 락 승격/재시도를 피한다.
+    스레드별 연결 간 쓰기 경합(SQLITE_BUSY)이 없도록 _write_lock으로 쓰기를 직렬화."""
+    with _write_lock, get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
 
 def _query_all(sql: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
@@ -53,21 +295,45 @@ def _query_all(sql: str, params: Iterable[Any] = ()) -> list[sqlite3.Row]:
         return cur.fetchall()
 
 
+def _query_iter_tuples(sql: str, params: Iterable[Any] = ()) -> Iterator[tuple[Any, ...]]:
+    """커서를 그대로 순회하며 sqlite3.Row 대신 일반 튜플을 넘기는 제너레이터 (열 순서가 고정된 포맷 루프용).
+    fetchall로 전체 결과를 리스트에 올리지 않고, 첫 next() 시점에 쿼리가 실행되므로 소비하는 스레드에서 DB 작업이 일어난다.
+    row_factory는 이 커서에만 해제하므로 연결의 다른 조회에는 영향이 없다."""
+    with get_conn() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        yield from cur.execute(sql, tuple(params))
+
+
 def _query_one(sql: str, params: Iterable[Any] = ()) -> sqlite3.Row | None:
     with get_conn() as conn:
         cur = conn.execute(sql, tuple(params))
         return cur.fetchone()
 
 
-def _execute(sql: str, params: Iterable[Any] = ()) -> int:
-    with get_conn() as conn:
+def _execute_returning(sql: str, params: Iterable[Any] = ()) -> sqlite3.Row | None:
+    """INSERT/UPDATE ... RETURNING 의 첫 행 (영향받은 행이 없으면 None)"""
+    with transaction() as conn:
         cur = conn.execute(sql, tuple(params))
-        return cur.rowcount
+        return cur.fetchone()
+
+
+def _check_schema(conn: sqlite3.Connection) -> None:
+    """기존 isms_requirements가 이 서버의 스키마와 다르면 트리거/색인을 만들기 전에 종료"""
+    columns = {row["name"] for row in conn.execute("SELECT name FROM pragma_table_info('isms_requirements')")}
+    missing = REQUIRED_REQ_COLUMNS - columns
+    if columns and missing:
+        raise SystemExit(
+            f"❌ {DB_PATH}: isms_requirements에 {', '.join(sorted(missing))} 컬럼이 없습니다. "
+            "이 서버용 DB를 ISMS_DB_PATH로 지정해 주세요."
+        )
 
 
 def init_database() -> None:
     """ISMS-P 관련 데이터베이스 초기화(테이블 생성 + 샘플 최소 삽입)"""
     with get_conn() as conn:
+        _check_schema(conn)
+    with transaction() as conn:
         conn.execute(
             """
             CREATE TABLE IF NOT EXISTS isms_requirements (
@@ -95,198 +361,213 @@ def init_database() -> None:
             """
         )
 
+        # 기간 조회용 (역순 스캔도 같은 인덱스로 처리)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_ev_created_at ON evidence_logs(created_at)")
+        # 준수 현황 LEFT JOIN은 인덱스 탐색, 항목별 최근 증적(ORDER BY created_at DESC LIMIT)은 정렬 없이 범위 스캔
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_evlogs_item_created ON evidence_logs(item_code, created_at DESC)"
+        )
+
         # 샘플 데이터가 없을 때만 삽입
         cur = conn.execute("SELECT COUNT(*) AS c FROM isms_requirements")
         if cur.fetchone()["c"] == 0:
-            sample_data = [
-                (
-                    "1.1.1",
-                    "1. 관리체계 수립 및 운영",
-                    "1.1 관리체계 기반 마련",
-                    "경영진 참여",
-                    "최고경영자는 정보보호 및 개인정보보호 관리체계 수립과 운영에 적극 참여하여야 한다.",
-                    "최고경영자의 정보보호 및 개인정보보호 관련 의사결정 참여 여부",
-                    "개인정보보호법 제29조",
-                ),
-                (
-                    "1.1.2",
-                    "1. 관리체계 수립 및 운영",
-                    "1.1 관리체계 기반 마련",
-                    "최고책임자 지정",
-                    "정보보호 및 개인정보보호 관리체계를 총괄하는 최고책임자를 지정하여야 한다.",
-                    "정보보호 및 개인정보보호 최고책임자 지정 여부",
-                    "개인정보보호법 제31조",
-                ),
-                (
-                    "2.1.1",
-                    "2. 보호대책 요구사항",
-                    "2.1 정책, 조직, 자산 관리",
-                    "정책의 유지관리",
-                    "정보보호 및 개인정보보호 정책을 정기적으로 검토하고 필요시 개정하여야 한다.",
-                    "정책 검토 및 개정 이력",
-                    "정보통신망법 제45조",
-                ),
-                (
-                    "2.7.1",
-                    "2. 보호대책 요구사항",
-                    "2.7 암호화 적용",
-                    "암호정책 수립 및 적용",
-                    "암호 사용에 대한 정책을 수립하고 암호키 관리절차를 포함하여야 한다.",
-                    "암호정책 수립 및 적용 여부",
-                    "개인정보보호법 제29조",
-                ),
-            ]
-            _exec_many(
-                conn,
-                """
-                INSERT OR IGNORE INTO isms_requirements
-                (item_code, chapter, category, item_title, description, check_items, related_laws)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-                """,
-                sample_data,
+            # 샘플 전체를 다중 VALUES 한 문장으로 삽입
+            values = ", ".join(["(?, ?, ?, ?, ?, ?, ?)"] * len(SAMPLE_REQUIREMENTS))
+            conn.execute(
+                "INSERT OR IGNORE INTO isms_requirements"
+                " (item_code, chapter, category, item_title, description, check_items, related_laws)"
+                f" VALUES {values}",
+                tuple(itertools.chain.from_iterable(SAMPLE_REQUIREMENTS)),
             )
 
+    # executescript는 열린 트랜잭션을 먼저 커밋하므로 트랜잭션 밖에서 실행
+    with get_conn() as conn:
+        _init_fts(conn)
+
+
+def _init_fts(conn: sqlite3.Connection) -> None:
+    """FTS5 색인 생성 + 초기 색인을 한 트랜잭션으로 처리 (실패 시 전부 롤백하고 LIKE 검색으로 동작)"""
+    global _fts_ready
+    _fts_ready = False
+    with _write_lock:
+        try:
+            # executescript는 스크립트 안의 BEGIN을 그대로 실행하므로 COMMIT 전까지 DDL이 확정되지 않음
+            conn.executescript("BEGIN IMMEDIATE;" + FTS_SCHEMA)
+            # 외부 콘텐츠 테이블의 COUNT(*)는 원본을 읽으므로 색인된 행 수는 docsize 섀도 테이블로 확인
+            indexed = conn.execute("SELECT COUNT(*) FROM isms_req_fts_docsize").fetchone()[0]
+            total = conn.execute("SELECT COUNT(*) FROM isms_requirements").fetchone()[0]
+            if indexed != total:
+                # 새로 만들었거나 이전 초기화가 중단된 색인 → 기존 행 전체 재색인
+                conn.execute("INSERT INTO isms_req_fts(isms_req_fts) VALUES ('rebuild')")
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return
+    _fts_ready = True
+
 
 # =========================
 # Domain Functions (sync)
 # =========================
-def _search_requirements(keyword: str, limit: int = 50) -> list[sqlite3.Row]:
+def _search_requirements(keyword: str, category: str | None = None, limit: int = SEARCH_LIMIT) -> list[sqlite3.Row]:
+    if _fts_ready and len(keyword) >= FTS_MIN_KEYWORD:
+        # 따옴표로 감싸 구문(phrase) 검색 → 특수문자가 FTS 문법으로 해석되지 않음
+        phrase = '"' + keyword.replace('"', '""') + '"'
+        if category:
+            return _query_all(SQL_SEARCH_FTS_CATEGORY, (phrase, limit, f"%{category}%", limit))
+        return _query_all(SQL_SEARCH_FTS, (phrase, limit))
     like = f"%{keyword}%"
-    return _query_all(
-        """
-        SELECT item_code, item_title, description, category
-        FROM isms_requirements
-        WHERE item_title LIKE ? OR description LIKE ? OR category LIKE ?
-        ORDER BY item_code
-        LIMIT ?
-        """,
-        (like, like, like, limit),
-    )
+    if category:
+        return _query_all(SQL_SEARCH_LIKE_CATEGORY, (like, like, like, f"%{category}%", limit))
+    return _query_all(SQL_SEARCH_LIKE, (like, like, like, limit))
+
+
+@lru_cache(maxsize=512)
+def _search_cached(keyword: str, category: str | None, limit: int = SEARCH_LIMIT) -> tuple[sqlite3.Row, ...]:
+    """검색 결과 캐시 (isms_requirements는 세션 중 고정). 키워드는 호출 측에서 정규화해 전달.
+    limit+1건까지 조회해 상한 초과 여부를 _fmt_search가 판단한다."""
+    return tuple(_search_requirements(keyword, category, limit + 1))
 
 
 def _get_requirement(item_code: str) -> sqlite3.Row | None:
-    return _query_one(
-        "SELECT * FROM isms_requirements WHERE item_code = ?",
-        (item_code,),
-    )
+    return _query_one(SQL_GET_REQUIREMENT, (item_code,))
+
+
+@lru_cache(maxsize=256)
+def _get_requirement_cached(item_code: str) -> dict[str, Any] | None:
+    """요구사항 행 스냅샷 (세션 중 isms_requirements는 바뀌지 않으므로 코드별로 캐시).
+    요구사항을 수정하는 경로가 생기면 _get_requirement_cached.cache_clear() 호출."""
+    row = _get_requirement(item_code)
+    return dict(row) if row else None
 
 
 def _get_recent_evidences(item_code: str, limit: int = 5) -> list[sqlite3.Row]:
-    return _query_all(
-        """
-        SELECT evidence_type, content, created_at
-        FROM evidence_logs
-        WHERE item_code = ?
-        ORDER BY created_at DESC
-        LIMIT ?
-        """,
-        (item_code, limit),
-    )
-
-
-def _insert_evidence(item_code: str, evidence_type: str, content: str) -> None:
-    _execute(
-        """
-        INSERT INTO evidence_logs (item_code, evidence_type, content)
-        VALUES (?, ?, ?)
-        """,
-        (item_code, evidence_type, content),
-    )
-
-
-def _list_requirements_by_category(category: str | None) -> list[sqlite3.Row]:
-    if category:
-        return _query_all(
-            "SELECT item_code, item_title FROM isms_requirements WHERE category LIKE ?",
-            (f"%{category}%",),
-        )
-    return _query_all("SELECT item_code, item_title FROM isms_requirements")
+    return _query_all(SQL_RECENT_EVIDENCES, (item_code, limit))
 
 
-def _count_evidences(item_code: str) -> int:
-    row = _query_one("SELECT COUNT(*) AS c FROM evidence_logs WHERE item_code = ?", (item_code,))
-    return int(row["c"] if row else 0)
+def _insert_evidence(item_code: str, evidence_type: str, content: str) -> sqlite3.Row | None:
+    """항목이 존재할 때만 증적을 넣고 (id, created_at, item_title)을 반환. 항목이 없으면 None."""
+    return _execute_returning(SQL_INSERT_EVIDENCE, (item_code, item_code, evidence_type, content))
 
 
-def _list_evidences_between(start_date: str | None, end_date: str | None) -> list[sqlite3.Row]:
-    base = "SELECT item_code, evidence_type, content, created_at FROM evidence_logs"
+def _compliance_counts(category: str | None) -> Iterator[tuple[str, str, int]]:
+    """요구사항별 증적 건수를 LEFT JOIN + GROUP BY 한 번으로 조회 -> (item_code, item_title, c)"""
+    if category:
+        return _query_iter_tuples(SQL_COMPLIANCE_CATEGORY, (f"%{category}%",))
+    return _query_iter_tuples(SQL_COMPLIANCE)
+
+
+def _list_evidences_between(start_date: str | None, end_date: str | None) -> Iterator[tuple[Any, ...]]:
+    """보고서용: 항목별 최근 증적 REPORT_PREVIEW_PER_ITEM건 + 항목별 증적 수(item_count)만 조회
+    -> (item_code, item_title, evidence_type, content, created_at, item_count)"""
     if start_date and end_date:
-        return _query_all(base + " WHERE created_at BETWEEN ? AND ? ORDER BY created_at DESC", (start_date, end_date))
-    return _query_all(base + " ORDER BY created_at DESC")
+        lower, upper = _day_range(start_date, end_date)
+        return _query_iter_tuples(SQL_EVLOGS_RANGE, (lower, upper, REPORT_PREVIEW_PER_ITEM))
+    return _query_iter_tuples(SQL_EVLOGS_ALL, (REPORT_PREVIEW_PER_ITEM,))
+
+
+def _day_range(start_date: str, end_date: str) -> tuple[str, str]:
+    """'YYYY-MM-DD' 기간을 created_at 비교용 반열린 구간 [start, end+1일)로 변환 (형식 오류 시 ValueError)"""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
 
 
 # =========================
 # Formatters
 # =========================
-def _fmt_search(keyword: str, rows: list[sqlite3.Row]) -> str:
+def _preview(text: str, n: int) -> str:
+    """n자를 넘으면 잘라서 '...'을 붙인 미리보기"""
+    return text if len(text) <= n else text[:n] + "..."
+
+
+def _fmt_search(keyword: str, rows: Sequence[sqlite3.Row], limit: int = SEARCH_LIMIT) -> str:
     if not rows:
         return f"'{keyword}' 관련 항목을 찾을 수 없습니다."
-    lines = [f"🔍 '{keyword}' 검색 결과 ({len(rows)}건)\n"]
-    for r in rows:
-        desc = (r["description"] or "").strip()
-        desc_preview = (desc[:100] + "...") if len(desc) > 100 else desc
-        lines.append(f"📌 [{r['item_code']}] {r['item_title']}\n"
-                     f"   카테고리: {r['category']}\n"
-                     f"   설명: {desc_preview}\n")
-    return "\n".join(lines)
+    # limit+1건으로 조회된 결과라 초과분이 있을 때만 잘렸다고 표시
+    truncated = len(rows) > limit
+    rows = rows[:limit]
+    header = f"🔍 '{keyword}' 검색 결과 ({len(rows)}건)\n"
+    if truncated:
+        header += f"   (상위 {limit}건만 표시합니다. 키워드를 좁혀 주세요.)\n"
+    return "\n".join(itertools.chain(
+        (header,),
+        (
+            f"📌 [{r['item_code']}] {r['item_title']}\n"
+            f"   카테고리: {r['category']}\n"
+            f"   설명: {_preview((r['description'] or '').strip(), 100)}\n"
+            for r in rows
+        ),
+    ))
+
 
+def _col(row: sqlite3.Row | dict[str, Any], *names: str) -> str:
+    """스키마별로 다른 컬럼명을 이름으로 조회 (먼저 존재하는 값 사용)"""
+    keys = row.keys()
+    for name in names:
+        if name in keys and row[name]:
+            return row[name]
+    return ""
 
-def _fmt_detail(req: sqlite3.Row, evidences: list[sqlite3.Row]) -> str:
+
+def _fmt_detail(req: sqlite3.Row | dict[str, Any], evidences: list[sqlite3.Row]) -> str:
+    # 이 서버가 만든 스키마(check_items)와 적재된 DB 스키마(key_checks 등)를 모두 지원
     lines = [
         "📋 ISMS-P 인증기준 상세정보\n",
         f"항목코드: {req['item_code']}",
-        f"장: {req['chapter']}",
-        f"카테고리: {req['category']}",
-        f"항목명: {req['item_title']}",
-        f"설명: {req['description'] or ''}",
-        f"점검항목: {req['check_items'] or ''}",
-        f"관련법령: {req['related_laws'] or ''}",
+        f"장: {_col(req, 'chapter')}",
+        f"카테고리: {_col(req, 'category', 'section_title')}",
+        f"항목명: {_col(req, 'item_title', 'title')}",
+        f"설명: {_col(req, 'description', 'certification_criteria')}",
+        f"점검항목: {_col(req, 'check_items', 'key_checks')}",
+        f"관련법령: {_col(req, 'related_laws')}",
     ]
     if evidences:
         lines.append(f"\n📁 등록된 증적 ({len(evidences)}건):")
-        for ev in evidences:
-            content = (ev["content"] or "")
-            preview = (content[:50] + "...") if len(content) > 50 else content
-            lines.append(f"  • [{ev['evidence_type']}] {preview} ({ev['created_at']})")
+        lines.extend(
+            f"  • [{ev['evidence_type']}] {_preview(ev['content'] or '', 50)} ({ev['created_at']})"
+            for ev in evidences
+        )
     else:
         lines.append("\n⚠️ 등록된 증적이 없습니다.")
     return "\n".join(lines)
 
 
-def _fmt_compliance(reqs: list[sqlite3.Row]) -> str:
-    total = len(reqs)
+def _fmt_compliance(rows: Iterable[tuple[str, str, int]]) -> str:
+    total = 0
     compliant = 0
     lines = ["📊 컴플라이언스 현황\n"]
-    for r in reqs:
-        c = _count_evidences(r["item_code"])
+    for item_code, item_title, c in rows:
+        total += 1
         status = "✅" if c > 0 else "❌"
-        if c > 0:
-            compliant += 1
-        lines.append(f"{status} [{r['item_code']}] {r['item_title']} ({c}건)")
+        compliant += c > 0
+        lines.append(f"{status} [{item_code}] {item_title} ({c}건)")
     rate = (compliant / total * 100) if total else 0.0
     lines.append(f"\n📈 준수율: {rate:.1f}% ({compliant}/{total})")
     return "\n".join(lines)
 
 
-def _fmt_report(evidences: list[sqlite3.Row], period: tuple[str, str] | None) -> str:
+def _fmt_report(evidences: Iterable[tuple[Any, ...]], period: tuple[str, str] | None) -> str:
+    # 그룹핑 (행은 항목별 최근 순으로 정렬되어 있고, 항목당 최대 REPORT_PREVIEW_PER_ITEM건)
+    # 행: (item_code, item_title, evidence_type, content, created_at, item_count)
+    by_item: defaultdict[str, list[tuple[Any, ...]]] = defaultdict(list)
+    for ev in evidences:
+        by_item[ev[0]].append(ev)
+    total = sum(group[0][5] for group in by_item.values())
+
     lines = ["📑 증적 현황 보고서\n" + "=" * 50 + "\n"]
     if period:
         lines.append(f"기간: {period[0]} ~ {period[1]}\n")
-    lines.append(f"총 증적 수: {len(evidences)}건\n")
-
-    # 그룹핑
-    by_item: dict[str, list[sqlite3.Row]] = {}
-    for ev in evidences:
-        by_item.setdefault(ev["item_code"], []).append(ev)
+    lines.append(f"총 증적 수: {total}건\n")
 
     for item_code, group in by_item.items():
-        req = _get_requirement(item_code)
-        title = req["item_title"] if req else "알 수 없음"
-        lines.append(f"\n[{item_code}] {title}\n  증적 수: {len(group)}건")
-        for ev in group[:3]:
-            content = ev["content"]
-            preview = (content[:40] + "...") if len(content) > 40 else content
-            lines.append(f"  • [{ev['evidence_type']}] {preview} ({ev['created_at']})")
+        _, title, *_, item_count = group[0]
+        lines.append(f"\n[{item_code}] {title or '알 수 없음'}\n  증적 수: {item_count}건")
+        lines.extend(
+            f"  • [{ev_type}] {_preview(content, 40)} ({created_at})"
+            for _, _, ev_type, content, created_at, _ in group
+        )
 
     return "\n".join(lines)
 
@@ -294,64 +575,69 @@ def _fmt_report(evidences: list[sqlite3.Row], period: tuple[str, str] | None) ->
 # =========================
 # MCP: Tools
 # =========================
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    return [
-        Tool(
-            name="search_requirements",
-            description="ISMS-P 인증기준 항목을 키워드로 검색합니다. 예: '접근권한', '로그', '암호화'",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "keyword": {"type": "string", "description": "검색할 키워드 (예: 접근권한, 로그, 정책)"}
-                },
-                "required": ["keyword"],
+# 고정 스키마라 import 시 1회만 생성
+_TOOLS: list[Tool] = [
+    Tool(
+        name="search_requirements",
+        description="ISMS-P 인증기준 항목을 키워드로 검색합니다. 예: '접근권한', '로그', '암호화'",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "keyword": {"type": "string", "description": "검색할 키워드 (예: 접근권한, 로그, 정책)"},
+                "category": {"type": "string", "description": "검색할 카테고리 (선택사항)"},
             },
-        ),
-        Tool(
-            name="get_requirement_detail",
-            description="특정 ISMS-P 인증기준 항목의 상세 정보를 조회합니다. 예: '1.1.1', '2.3.1'",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "item_code": {"type": "string", "description": "항목 코드 (예: 1.1.1, 2.3.1)"}
-                },
-                "required": ["item_code"],
+            "required": ["keyword"],
+        },
+    ),
+    Tool(
+        name="get_requirement_detail",
+        description="특정 ISMS-P 인증기준 항목의 상세 정보를 조회합니다. 예: '1.1.1', '2.3.1'",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "item_code": {"type": "string", "description": "항목 코드 (예: 1.1.1, 2.3.1)"}
             },
-        ),
-        Tool(
-            name="generate_evidence",
-            description="특정 항목에 대한 증적을 자동으로 생성합니다.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "item_code": {"type": "string", "description": "증적을 생성할 항목 코드"},
-                    "evidence_type": {"type": "string", "description": "증적 유형 (문서, 로그, 스크린샷 등)"},
-                    "content": {"type": "string", "description": "증적 내용 또는 설명"},
-                },
-                "required": ["item_code", "evidence_type", "content"],
+            "required": ["item_code"],
+        },
+    ),
+    Tool(
+        name="generate_evidence",
+        description="특정 항목에 대한 증적을 자동으로 생성합니다.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "item_code": {"type": "string", "description": "증적을 생성할 항목 코드"},
+                "evidence_type": {"type": "string", "description": "증적 유형 (문서, 로그, 스크린샷 등)"},
+                "content": {"type": "string", "description": "증적 내용 또는 설명"},
             },
-        ),
-        Tool(
-            name="check_compliance",
-            description="현재 증적 현황을 기반으로 컴플라이언스 준수 여부를 점검합니다.",
-            inputSchema={
-                "type": "object",
-                "properties": {"category": {"type": "string", "description": "점검할 카테고리 (선택사항)"}},
-            },
-        ),
-        Tool(
-            name="create_audit_report",
-            description="증적 현황 보고서를 생성합니다.",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "start_date": {"type": "string", "description": "시작 날짜 (YYYY-MM-DD)"},
-                    "end_date": {"type": "string", "description": "종료 날짜 (YYYY-MM-DD)"},
-                },
+            "required": ["item_code", "evidence_type", "content"],
+        },
+    ),
+    Tool(
+        name="check_compliance",
+        description="현재 증적 현황을 기반으로 컴플라이언스 준수 여부를 점검합니다.",
+        inputSchema={
+            "type": "object",
+            "properties": {"category": {"type": "string", "description": "점검할 카테고리 (선택사항)"}},
+        },
+    ),
+    Tool(
+        name="create_audit_report",
+        description="증적 현황 보고서를 생성합니다.",
+        inputSchema={
+            "type": "object",
+            "properties": {
+                "start_date": {"type": "string", "description": "시작 날짜 (YYYY-MM-DD)"},
+                "end_date": {"type": "string", "description": "종료 날짜 (YYYY-MM-DD)"},
             },
-        ),
-    ]
+        },
+    ),
+]
+
+
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    return _TOOLS
 
 
 # =========================
@@ -359,45 +645,58 @@ async def list_tools() -> list[Tool]:
 # =========================
 @app.call_tool()
 async def call_tool(name: str, arguments: Any) -> list[TextContent]:
-    # DB 작업은 to_thread로 오프로드
+    args = arguments or _EMPTY
+    # 스캔·쓰기처럼 블로킹될 수 있는 DB 작업은 to_thread로 오프로드
     if name == "search_requirements":
-        keyword: str = (arguments or {}).get("keyword", "")
-        rows = await asyncio.to_thread(_search_requirements, keyword)
+        keyword: str = args.get("keyword", "")
+        category = args.get("category")
+        # FTS(trigram)·LIKE 모두 대소문자를 구분하지 않으므로 소문자로 정규화해 캐시 적중률을 높임
+        norm_cat = category.strip().lower() if category else None
+        rows = await asyncio.to_thread(_search_cached, keyword.strip().lower(), norm_cat or None)
         text = _fmt_search(keyword, rows)
         return [TextContent(type="text", text=text)]
 
     elif name == "get_requirement_detail":
-        item_code: str = (arguments or {}).get("item_code", "")
-        req = await asyncio.to_thread(_get_requirement, item_code)
+        item_code: str = args.get("item_code", "")
+        # PK 조회(캐시) + 인덱스 범위 LIMIT 5라 수십 µs → 스레드 전환 없이 이벤트 루프에서 바로 실행
+        req = _get_requirement_cached(item_code)
         if not req:
             return [TextContent(type="text", text=f"항목 '{item_code}'를 찾을 수 없습니다.")]
-        evidences = await asyncio.to_thread(_get_recent_evidences, item_code, 5)
+        evidences = _get_recent_evidences(item_code, 5)
         return [TextContent(type="text", text=_fmt_detail(req, evidences))]
 
     elif name == "generate_evidence":
-        item_code = (arguments or {}).get("item_code", "")
-        evidence_type = (arguments or {}).get("evidence_type", "")
-        content = (arguments or {}).get("content", "")
+        item_code = args.get("item_code", "")
+        evidence_type = args.get("evidence_type", "")
+        content = args.get("content", "")
 
-        exists = await asyncio.to_thread(_get_requirement, item_code)
-        if not exists:
+        # 존재 확인 + INSERT를 한 문장으로 (항목이 없으면 삽입 행 없음)
+        saved = await asyncio.to_thread(_insert_evidence, item_code, evidence_type, content)
+        if not saved:
             return [TextContent(type="text", text=f"❌ 항목 '{item_code}'가 존재하지 않습니다.")]
-        await asyncio.to_thread(_insert_evidence, item_code, evidence_type, content)
-        preview = (content[:100] + "...") if len(content) > 100 else content
-        return [TextContent(type="text", text=f"✅ [{item_code}] 증적이 등록되었습니다.\n유형: {evidence_type}\n내용: {preview}")]
+        preview = _preview(content, 100)
+        return [TextContent(
+            type="text",
+            text=f"✅ [{item_code}] {saved['item_title']} 증적이 등록되었습니다.\n"
+                 f"증적 ID: {saved['id']}\n유형: {evidence_type}\n내용: {preview}\n등록일시: {saved['created_at']}",
+        )]
 
     elif name == "check_compliance":
-        category = (arguments or {}).get("category")
-        reqs = await asyncio.to_thread(_list_requirements_by_category, category)
-        text = await asyncio.to_thread(_fmt_compliance, reqs)  # 내부에서 count 쿼리 호출
+        category = args.get("category")
+        # 조회는 제너레이터라 포맷팅과 함께 워커 스레드에서 스트리밍 처리
+        text = await asyncio.to_thread(_fmt_compliance, _compliance_counts(category))
         return [TextContent(type="text", text=text)]
 
     elif name == "create_audit_report":
-        start_date = (arguments or {}).get("start_date")
-        end_date = (arguments or {}).get("end_date")
-        evidences = await asyncio.to_thread(_list_evidences_between, start_date, end_date)
+        start_date = args.get("start_date")
+        end_date = args.get("end_date")
+        try:
+            evidences = _list_evidences_between(start_date, end_date)
+        except ValueError:
+            return [TextContent(type="text", text="❌ 날짜는 YYYY-MM-DD 형식으로 입력해 주세요.")]
         period = (start_date, end_date) if start_date and end_date else None
-        return [TextContent(type="text", text=_fmt_report(evidences, period))]
+        text = await asyncio.to_thread(_fmt_report, evidences, period)
+        return [TextContent(type="text", text=text)]
 
     return [TextContent(type="text", text=f"알 수 없는 도구: {name}")]
 
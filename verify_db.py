@@ -87,13 +87,16 @@ def verify_database(db_path='database/isms_p.db'):
             '3': '개인정보 처리 단계별 요구사항'
         }
         
+        # 장별 개수를 한 번의 GROUP BY로 집계
+        cursor.execute("""
+            SELECT substr(item_code, 1, 2), COUNT(*) 
+            FROM isms_requirements 
+            GROUP BY 1
+        """)
+        counts = dict(cursor.fetchall())
+        
         for chapter_num, chapter_name in chapters.items():
-            cursor.execute(f"""
-                SELECT COUNT(*) 
-                FROM isms_requirements 
-                WHERE item_code LIKE '{chapter_num}.%'
-            """)
-            count = cursor.fetchone()[0]
+            count = counts.get(f"{chapter_num}.", 0)
             print(f"   제{chapter_num}장 ({chapter_name}): {count}개")
         
         print()